@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for `calude.py serve`.
+
+Publishes a synthetic marathon schedule to a throwaway cache, starts the query
+server on a free local port and hammers it from keep-alive client threads,
+reporting requests per second for each query type.
+
+    python benchmarks/serve_load.py --clients 8 --duration 5
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+import http.client
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import typer
+from typing_extensions import Annotated
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.index import TIME_FORMAT
+from lib.pipeline import ContentCache
+from lib.schedule import Run
+from lib.server import RunServer
+
+
+RUNNERS = [f"runner{number}" for number in range(150)]
+PLATFORMS = ["PC", "SNES", "NES", "N64", "GBA", "PS1", "PS2", "Switch"]
+CATEGORIES = ["Any%", "100%", "Low%", "All Bosses", "Glitchless"]
+
+
+def synthetic_runs(count: int) -> list[Run]:
+    start = datetime(2024, 1, 7, 16, 30)
+    runs = []
+    for number in range(count):
+        end = start + timedelta(minutes=random.randint(10, 120))
+        runs.append(
+            Run(
+                f"Game {number}",
+                "",
+                start.strftime(TIME_FORMAT),
+                end.strftime(TIME_FORMAT),
+                category=random.choice(CATEGORIES),
+                platform=random.choice(PLATFORMS),
+                runners=random.sample(RUNNERS, random.randint(1, 4)),
+                host=random.choice(RUNNERS),
+                couch=random.sample(RUNNERS, random.randint(0, 3)),
+            )
+        )
+        start = end
+    return runs
+
+
+def query_paths(runs: list[Run]) -> dict[str, list[str]]:
+    times = [run.start for run in runs]
+    return {
+        "now": [f"/runs/now?at={random.choice(times)}" for _ in range(100)],
+        "next by runner": [
+            f"/runs/next?runner={random.choice(RUNNERS)}&at={random.choice(times)}"
+            for _ in range(100)
+        ],
+        "by platform": [f"/runs?platform={platform}" for platform in PLATFORMS],
+        "live now": ["/runs/now"],
+    }
+
+
+def hammer(port: int, paths: list[str], deadline: float, counts: list, etag: bool):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    completed = 0
+    while time.perf_counter() < deadline:
+        path = random.choice(paths)
+        headers = {"If-None-Match": etags[path]} if etag and path in etags else {}
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status not in (200, 304):
+            raise RuntimeError(f"{path} returned {response.status}")
+        etags[path] = response.getheader("ETag")
+        completed += 1
+    connection.close()
+    counts.append(completed)
+
+
+def main(
+    runs: Annotated[int, typer.Option(help="Number of synthetic runs.")] = 300,
+    clients: Annotated[int, typer.Option(help="Concurrent client threads.")] = 8,
+    duration: Annotated[float, typer.Option(help="Seconds per query type.")] = 5,
+    etag: Annotated[
+        bool, typer.Option(help="Revalidate with If-None-Match like a polling tool.")
+    ] = False,
+):
+    run_set = synthetic_runs(runs)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ContentCache(cache_dir)
+        serialized = json.dumps([run.to_dict() for run in run_set])
+        cache.store("runs", "bench", serialized)
+        cache.mark_latest("runs", "bench")
+
+        server = RunServer(("127.0.0.1", 0), cache)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        typer.echo(f"{runs} runs, {clients} clients, {duration:g}s per query type")
+        for name, paths in query_paths(run_set).items():
+            counts = []
+            deadline = time.perf_counter() + duration
+            workers = [
+                threading.Thread(
+                    target=hammer,
+                    args=(server.server_port, paths, deadline, counts, etag),
+                )
+                for _ in range(clients)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            typer.echo(f"{name:>16}: {sum(counts) / duration:10.0f} req/s")
+
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -3,6 +3,7 @@
 from concurrent.futures import ThreadPoolExecutor
 import typing as t
 import re
+import inspect
 import json
 from pathlib import Path
 from datetime import datetime
@@ -10,47 +11,137 @@ from traceback import format_exc
 
 import typer
 from typing_extensions import Annotated
+from googleapiclient.errors import HttpError
+from selenium.common.exceptions import WebDriverException
 
 from lib.logging import Logger
-from lib.schedule import ScheduleParser, Run
+from lib import schedule
 from lib.schedule import ScheduleParser, Run
 from lib.interfaces import HTMLInterface, GCalInterface, ICSInterface
 from lib.tasks import spin, track
-from lib.notifications import Emailer
+from lib.pipeline import Stage, StageError, CacheError, ContentCache
+from lib.notifications import Emailer, AlertDispatcher
+from lib.server import RunServer
 from settings import EMAIL_RECIPIENTS
 
 
+SCHEDULE_URL = "https://gamesdonequick.com/schedule"
+cache = ContentCache("./cache")
+
+
 def initialize_calendar(calendar_id: str) -> GCalInterface:
     return GCalInterface(calendar_id) if calendar_id else None
 
 
+def fetch_schedule_html(url: str) -> str:
+    site_interface = HTMLInterface(url)
+    try:
+        schedule_html = site_interface.get_html()
+    finally:
+        site_interface.driver.quit()
+    return schedule_html
+
+
+def run_schedule_parser(schedule_html: str) -> list[Run]:
+    return ScheduleParser(schedule_html).parse()
+
+
+def parse_schedule_html(schedule_html: str) -> list[Run]:
+    # cache I/O stays outside the stages, so a disk error is neither retried as a
+    # fetch failure nor reported as a parse failure
+    # key on every parser input: the parser source, so parser fixes aren't masked by
+    # stale results, and the local UTC offset, which shifts across DST changes
+    runs_key = cache.digest(
+        f"{ScheduleParser.get_timezone_offset()}"
+        + inspect.getsource(schedule)
+        + schedule_html
+    )
+    cached_runs = cache.load("runs", runs_key)
+    if cached_runs is not None:
+        parsed_runs = [Run.from_dict(run) for run in json.loads(cached_runs)]
+    else:
+        parsed_runs = parse_stage(schedule_html)
+        cache.store(
+            "runs", runs_key, json.dumps([run.to_dict() for run in parsed_runs])
+        )
+    cache.mark_latest("runs", runs_key)  # picked up by `calude.py serve`
+    return parsed_runs
+
+
+def diff_calendar(
+    calendar: GCalInterface, parsed_runs: list[Run], clear_calendar: bool
+) -> t.Tuple[list, list]:
+    existing_events = calendar.get_all_events()
+    if clear_calendar:
+        return existing_events, [run.to_gcal_event() for run in parsed_runs]
+
+    outdated_events = calendar.find_outdated_events(parsed_runs)
+    existing_runs = [Run.from_gcal_event(event) for event in existing_events]
+    events_to_add = [
+        run.to_gcal_event() for run in parsed_runs if run not in existing_runs
+    ]
+    return outdated_events, events_to_add
+
+
+def apply_calendar_changes(
+    calendar: GCalInterface, events_to_delete: list, events_to_add: list
+):
+    # individual API calls already back off on HttpError; retrying the whole stage
+    # would re-add events that were inserted before the failure
+    if events_to_delete:
+        track(calendar.delete_event, events_to_delete, "Deleting outdated events ...")
+    if events_to_add:
+        track(calendar.add_event, events_to_add, "Adding events to calendar ...")
+    calendar.cached_events = None
+
+
+# page loads flake, but a parse failure on a fetched page is a DOM change that
+# no amount of refetching will fix, so only the network-bound stages retry
+fetch_stage = Stage(
+    "fetch", fetch_schedule_html, retry_on=(WebDriverException, OSError)
+)
+parse_stage = Stage("parse", run_schedule_parser)
+diff_stage = Stage("diff", diff_calendar, retry_on=(HttpError, OSError))
+apply_stage = Stage("apply", apply_calendar_changes)
+
+
 @spin("Initializing calendar & parsing schedule ...")
 def parse_schedule_and_init_gcal(
-    parsing_attempt_limit: int, calendar_id: str
+    calendar_id: str, use_cached_html: bool
 ) -> t.Tuple[list[Run], GCalInterface]:
     with ThreadPoolExecutor() as executor:
         calendar_thread = executor.submit(initialize_calendar, calendar_id)
 
-    # schedule parsing must occur in main thread
-    for attempt in range(parsing_attempt_limit):
-        try:
-            site_interface = HTMLInterface("https://gamesdonequick.com/schedule")
-            schedule_html = site_interface.get_html()
-            site_interface.driver.quit()
-            parser = ScheduleParser(schedule_html)
-            parsed_runs = parser.parse()
-            break
-        except:
-            if attempt + 1 < parsing_attempt_limit:
-                continue
-            raise
+        # schedule parsing must occur in main thread
+        schedule_html = cache.load_latest("html") if use_cached_html else None
+        if schedule_html is None:
+            schedule_html = fetch_stage(SCHEDULE_URL)
+            cache.store_latest("html", schedule_html)
+        parsed_runs = parse_schedule_html(schedule_html)
 
     return parsed_runs, calendar_thread.result()
 
 
 @spin("Checking for outdated events ...")
-def find_outdated_events(calendar: GCalInterface, existing_runs: list[Run]) -> list:
-    return calendar.find_outdated_events(existing_runs)
+def find_calendar_changes(
+    calendar: GCalInterface, parsed_runs: list[Run], clear_calendar: bool
+) -> t.Tuple[list, list]:
+    return diff_stage(calendar, parsed_runs, clear_calendar)
+
+
+def describe_stage_error(error: StageError) -> str:
+    if error.retryable:
+        return (
+            f"The {error.stage} stage kept failing with transient errors and gave up "
+            "after its last retry; the next scheduled run will try again."
+        )
+    if error.stage == "parse":
+        return (
+            "Parsing the fetched schedule page failed and was not retried, since "
+            "refetching would not help; the page layout has probably changed. Once "
+            "the parser is fixed, rerun with '-C' to reparse the cached HTML."
+        )
+    return f"The {error.stage} stage failed with a non-retryable error."
 
 
 def log_format_events(events: t.List[t.Dict]) -> t.List[t.Dict]:
@@ -87,7 +178,12 @@ def validate_gcal_id(calendar_id: str) -> t.Union[str, None]:
     return calendar_id
 
 
+app = typer.Typer()
+
+
+@app.callback(invoke_without_command=True)
 def main(
+    ctx: typer.Context,
     google_calendar_id: Annotated[
         str,
         typer.Option(
@@ -127,22 +223,35 @@ def main(
         typer.Option(
             "-r",
             "--retries",
-            help="Maximum number of times to retry parsing.",
+            help="Maximum number of attempts for each network-bound stage.",
             min=1,
             max=10,
         ),
     ] = 5,
+    use_cached_html: Annotated[
+        bool,
+        typer.Option(
+            "-C",
+            "--use-cached-html",
+            help="Reparse the last fetched schedule page instead of fetching it.",
+        ),
+    ] = False,
 ):
+    if ctx.invoked_subcommand is not None:
+        return
+
     if not google_calendar_id and not no_gcal:
         raise typer.BadParameter(
             "A calendar ID must be specified with '-g' for third-party calendar functionality. "
             "Try running with '--no-gcal' to bypass this."
         )
     log = Logger("calude_updates")
+    fetch_stage.max_tries = diff_stage.max_tries = maximum_retries
+    alerts = AlertDispatcher(Emailer, EMAIL_RECIPIENTS, log)
 
     try:
         parsed_runs, calendar = parse_schedule_and_init_gcal(
-            parsing_attempt_limit=maximum_retries, calendar_id=google_calendar_id
+            calendar_id=google_calendar_id, use_cached_html=use_cached_html
         )
 
         typer.echo(f"Parsed {len(parsed_runs)} runs")
@@ -162,33 +271,24 @@ def main(
                 )
             exit(0)
 
-        if clear_calendar:
-            all_events = calendar.get_all_events()
-            log.debug(f"Cleared Events: {log_format_events(all_events)}")
-            track(calendar.delete_event, all_events, "Clearing calendar ...")
-            calendar.cached_events = None
-
-        outdated_events = find_outdated_events(calendar, parsed_runs)
-        if outdated_events:
-            log.debug(f"Outdated Events: {log_format_events(outdated_events)}")
-            track(
-                calendar.delete_event, outdated_events, "Deleting outdated events ..."
+        events_to_delete, events_to_add = find_calendar_changes(
+            calendar, parsed_runs, clear_calendar
+        )
+        if events_to_delete:
+            log.debug(
+                f"{'Cleared' if clear_calendar else 'Outdated'} Events: "
+                f"{log_format_events(events_to_delete)}"
             )
         else:
             typer.echo("No outdated events.")
 
-        existing_events = calendar.get_all_events()
-        events_to_add = [
-            run.to_gcal_event()
-            for run in parsed_runs
-            if run not in [Run.from_gcal_event(event) for event in existing_events]
-        ]
         if events_to_add:
             log.debug(f"New Events: {log_format_events(events_to_add)}")
-            track(calendar.add_event, events_to_add, "Adding events to calendar ...")
         else:
             typer.echo("No runs to add; calendar is up-to-date.")
 
+        apply_stage(calendar, events_to_delete, events_to_add)
+
         typer.echo("Done!")
 
     except (
@@ -196,13 +296,64 @@ def main(
     ):  # prevent exit(0) call from triggering notifications if -G is used
         raise
 
+    except StageError as error:
+        if debug_mode:
+            raise
+
+        summary = describe_stage_error(error)
+        typer.echo(summary, err=True)
+        alerts.submit(f"{summary}\n\n{format_exc()}")
+
+    except CacheError as error:
+        if debug_mode:
+            raise
+
+        summary = (
+            f"The local {error}. Check that it is writable and has free space; "
+            "nothing was retried or refetched because of it."
+        )
+        typer.echo(summary, err=True)
+        alerts.submit(f"{summary}\n\n{format_exc()}")
+
     except:
         if debug_mode:
             raise
 
-        error_emailer = Emailer()
-        error_emailer.send_alert(format_exc(), EMAIL_RECIPIENTS)
+        alerts.submit(format_exc())
+
+    finally:
+        alerts.close(timeout=120)
+
+
+@app.command()
+def serve(
+    host: Annotated[
+        str, typer.Option("--host", help="Address to bind the query server to.")
+    ] = "127.0.0.1",
+    port: Annotated[
+        int, typer.Option("-p", "--port", help="Port to serve the query API on.")
+    ] = 8080,
+    refresh_interval: Annotated[
+        float,
+        typer.Option(
+            "--refresh-interval",
+            help="Seconds between checks for a newly parsed schedule.",
+            min=1,
+        ),
+    ] = 30,
+):
+    """Serve the most recently parsed runs over a local HTTP/JSON API."""
+    server = RunServer((host, port), cache, refresh_interval=refresh_interval)
+    typer.echo(
+        f"Serving {len(server.state[0])} runs on http://{host}:{server.server_port}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":
-    typer.run(main)
+    app()
@@ -0,0 +1,115 @@
+import bisect
+import typing as t
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from .schedule import Run
+
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def to_utc_string(timestamp: t.Union[str, datetime]) -> str:
+    """Normalize an ISO 8601 timestamp (naive means UTC) to the format `Run` uses."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc).strftime(TIME_FORMAT)
+
+
+def _normalize(value: str) -> str:
+    return value.strip().casefold()
+
+
+class RunIndex:
+    """
+    Immutable, query-ready view of one parsed run set.
+
+    Runs are kept sorted by start time alongside a running maximum of their end
+    times, which makes the list an interval index: every run overlapping a window
+    sits just before the first start past the window, and the scan back can stop
+    as soon as no earlier run ends inside it. Cast and metadata fields get
+    inverted indexes mapping each (case-folded) value to run positions.
+    """
+
+    indexed_fields = ["runners", "couch", "host", "platform", "category"]
+
+    def __init__(self, runs: t.Iterable[Run], version: str = None):
+        self.version = version
+        self.runs = sorted(runs, key=lambda run: (run.start, run.end))
+        self._starts = [run.start for run in self.runs]
+        self._max_ends = list(accumulate((run.end for run in self.runs), max))
+        self._inverted: t.Dict[str, t.Dict[str, list[int]]] = {
+            field: {} for field in self.indexed_fields
+        }
+
+        for position, run in enumerate(self.runs):
+            for field in self.indexed_fields:
+                values = getattr(run, field)
+                if not values:
+                    continue
+                for value in [values] if isinstance(values, str) else values:
+                    self._inverted[field].setdefault(_normalize(value), []).append(
+                        position
+                    )
+
+    def __len__(self):
+        return len(self.runs)
+
+    def _overlapping(self, start: str, end: str) -> list[int]:
+        if start == end:  # point query: runs in progress at `start`
+            upper = bisect.bisect_right(self._starts, end)
+        else:
+            upper = bisect.bisect_left(self._starts, end)
+
+        positions = []
+        for position in range(upper - 1, -1, -1):
+            if self._max_ends[position] <= start:
+                break
+            if self.runs[position].end > start:
+                positions.append(position)
+        positions.reverse()
+        return positions
+
+    def _matching(self, field: str, value: str) -> list[int]:
+        return self._inverted[field].get(_normalize(value), [])
+
+    def query(
+        self,
+        start: str = None,
+        end: str = None,
+        after: str = None,
+        limit: int = None,
+        **filters: str,
+    ) -> list[Run]:
+        """
+        Runs matching every given filter, in start order.
+
+        `start`/`end` select runs overlapping that window (either bound may be
+        omitted; equal bounds select runs in progress at that instant), `after`
+        selects runs starting at or after a time, and `filters` match
+        `indexed_fields` by exact, case-insensitive value.
+        """
+        candidates = None
+        for field, value in filters.items():
+            if field not in self._inverted:
+                raise KeyError(field)
+            matches = set(self._matching(field, value))
+            candidates = matches if candidates is None else candidates & matches
+
+        if start is not None or end is not None:
+            window = self._overlapping(
+                start or "", end or max(self._max_ends, default="")
+            )
+            candidates = set(window) if candidates is None else candidates & set(window)
+
+        lower = 0 if after is None else bisect.bisect_left(self._starts, after)
+        if candidates is None:
+            positions = range(lower, len(self.runs))
+        else:
+            positions = sorted(position for position in candidates if position >= lower)
+
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.runs[position] for position in positions]
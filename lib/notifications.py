@@ -1,28 +1,294 @@
+import os
 import ssl
+import json
+import time
+import logging
+import queue
 import smtplib
+import hashlib
+import threading
+import typing as t
 from email.message import EmailMessage
 from email.utils import formataddr
+from pathlib import Path
 
-from _auth.email import username, password
-from settings import SMTP
+from settings import SMTP, ALERTS
+
+
+class SMTPConnection:
+    """Persistent SMTP session, (re)established lazily whenever it is needed."""
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        username: str,
+        password: str,
+        use_tls: bool = True,
+        timeout: float = 30,
+        smtp_class: t.Type[smtplib.SMTP] = smtplib.SMTP,
+    ):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.smtp_class = smtp_class
+        self._session = None
+
+    @classmethod
+    def from_settings(cls) -> "SMTPConnection":
+        from _auth.email import username, password
+
+        return cls(SMTP["server"], SMTP["port"], username, password)
+
+    def _connect(self) -> smtplib.SMTP:
+        session = self.smtp_class(self.server, self.port, timeout=self.timeout)
+        if self.use_tls:
+            session.starttls(context=ssl.create_default_context())
+        if self.username:
+            session.login(self.username, self.password)
+        return session
+
+    def send_message(self, message: EmailMessage):
+        if self._session is None:
+            self._session = self._connect()
+        try:
+            self._session.send_message(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # the server dropped an idle session; reconnect and retry once
+            self._session = self._connect()
+            self._session.send_message(message)
+
+    def close(self):
+        if self._session is None:
+            return
+        try:
+            self._session.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._session = None
 
 
 class Emailer:
-    def __init__(self):
-        self.server = smtplib.SMTP(SMTP["server"], SMTP["port"])
-        self.server.starttls(context=ssl.create_default_context())
-        self.server.login(username, password)
+    def __init__(self, connection: SMTPConnection = None):
+        self.connection = connection or SMTPConnection.from_settings()
 
     def _create_message(self, subject: str, recipients: list[str], use_bcc=True):
         message = EmailMessage()
         message["Subject"] = subject
-        message["From"] = formataddr(("Calude Errors", username))
+        message["From"] = formataddr(("Calude Errors", self.connection.username))
         message["Bcc" if use_bcc else "To"] = recipients
         return message
 
-    def send_alert(self, error_message: str, recipients: list[str]):
+    def send_alert(
+        self, error_message: str, recipients: list[str], subject="Calendar Error"
+    ):
         message = self._create_message(
-            subject="Calendar Error", recipients=recipients, use_bcc=False
+            subject=subject, recipients=recipients, use_bcc=False
         )
         message.set_content(error_message)
-        self.server.send_message(message)
+        self.connection.send_message(message)
+
+    def close(self):
+        self.connection.close()
+
+
+class _Alert:
+    def __init__(self, error_message: str, first_seen: float, repeats: int = 0):
+        self.error_message = error_message
+        self.first_seen = first_seen
+        self.repeats = repeats  # occurrences after the first one, not yet reported
+
+    def to_dict(self) -> dict:
+        return {
+            "error_message": self.error_message,
+            "first_seen": self.first_seen,
+            "repeats": self.repeats,
+        }
+
+    @classmethod
+    def from_dict(cls, alert_dict: dict) -> "_Alert":
+        return cls(**alert_dict)
+
+
+class AlertDispatcher:
+    """
+    Sends alerts from a background thread so callers never block on SMTP.
+
+    Identical tracebacks are merged per `coalesce_window`: the first one is sent
+    right away and later ones only bump a counter. The first occurrence after the
+    window closes is folded into a single summary email and opens the next window,
+    so a steady failure costs one email per window. A window that closes without
+    a new occurrence has its summary sent on the next dispatcher run.
+
+    Emails are spaced at least `min_send_interval` seconds apart. Anything sent
+    too soon waits in an outbox instead of sleeping out the interval.
+
+    Each run of the updater is its own process. The merge table, the outbox and
+    the time of the last email therefore live in `state_path` and carry over
+    between dispatchers.
+    """
+
+    def __init__(
+        self,
+        emailer_factory: t.Callable[[], Emailer],
+        recipients: list[str],
+        log: logging.Logger,
+        state_path: t.Union[str, Path] = ALERTS["state_file"],
+        coalesce_window: float = ALERTS["coalesce_window"],
+        min_send_interval: float = ALERTS["min_send_interval"],
+        clock: t.Callable[[], float] = time.time,
+    ):
+        self.emailer_factory = emailer_factory
+        self.recipients = recipients
+        self.log = log
+        self.state_path = Path(state_path)
+        self.coalesce_window = coalesce_window
+        self.min_send_interval = min_send_interval
+        self.clock = clock
+
+        self._emailer = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()  # guards the state below against close()
+        self._alerts: t.Dict[str, _Alert] = {}
+        self._outbox: list[dict] = []
+        self._last_send = None
+        self._worker = threading.Thread(
+            target=self._run, name="alert-dispatcher", daemon=True
+        )
+        self._worker.start()
+
+    @staticmethod
+    def _fingerprint(error_message: str) -> str:
+        return hashlib.sha256(error_message.strip().encode()).hexdigest()
+
+    def submit(self, error_message: str):
+        self._queue.put(error_message)
+
+    def close(self, timeout: float = None):
+        """Send whatever is due, save the merge state and stop the worker."""
+        self._queue.put(None)
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            # the daemon worker dies with the process, most likely mid-send
+            self.log.warning(f"Alert dispatcher did not stop within {timeout}s")
+            self._save_state()
+
+    def _load_state(self):
+        if not self.state_path.is_file():
+            return
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            last_send = state["last_send"]
+            alerts = {
+                key: _Alert.from_dict(alert) for key, alert in state["alerts"].items()
+            }
+            outbox = [
+                {"subject": email["subject"], "body": email["body"]}
+                for email in state.get("outbox", [])
+            ]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.log.exception(f"Ignoring unreadable alert state {self.state_path}")
+            return
+        self._last_send = last_send
+        self._alerts = alerts
+        self._outbox = outbox
+
+    def _save_state(self):
+        with self._lock:
+            state = {
+                "last_send": self._last_send,
+                "alerts": {key: alert.to_dict() for key, alert in self._alerts.items()},
+                "outbox": list(self._outbox),
+            }
+            try:
+                self.state_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.state_path.with_name(f".{self.state_path.name}.tmp")
+                temp_path.write_text(json.dumps(state), encoding="utf-8")
+                os.replace(temp_path, self.state_path)
+            except OSError:
+                self.log.exception(f"Failed to save alert state {self.state_path}")
+
+    def _send(self, body: str, subject: str = "Calendar Error"):
+        self._outbox.append({"subject": subject, "body": body})
+
+    def _send_repeats(self, alert: _Alert):
+        self._send(
+            f"The following error occurred {alert.repeats} more time(s):\n\n"
+            + alert.error_message,
+            subject="Calendar Error (repeated)",
+        )
+        alert.repeats = 0
+
+    def _handle(self, error_message: str):
+        key = self._fingerprint(error_message)
+        now = self.clock()
+        alert = self._alerts.get(key)
+        if alert is None:
+            self._alerts[key] = _Alert(error_message, now)
+            self._send(error_message)
+            return
+
+        alert.repeats += 1
+        if now - alert.first_seen >= self.coalesce_window:
+            self._send_repeats(alert)
+            alert.first_seen = now
+
+    def _expire(self):
+        now = self.clock()
+        for key, alert in list(self._alerts.items()):
+            if now - alert.first_seen < self.coalesce_window:
+                continue
+            if alert.repeats:
+                self._send_repeats(alert)
+            del self._alerts[key]
+
+    def _drain_outbox(self):
+        while True:
+            with self._lock:
+                if not self._outbox:
+                    return
+                if (
+                    self._last_send is not None
+                    and self.clock() - self._last_send < self.min_send_interval
+                ):
+                    return  # rate limited; stays in the outbox for a later attempt
+                email = self._outbox[0]
+
+            try:
+                if self._emailer is None:
+                    self._emailer = self.emailer_factory()
+                self._emailer.send_alert(
+                    email["body"], self.recipients, subject=email["subject"]
+                )
+            except Exception:
+                # alerting must never take the process down with it, but the
+                # alert itself shouldn't vanish either
+                self.log.exception(f"Failed to send alert email:\n{email['body']}")
+
+            with self._lock:
+                self._outbox.remove(email)
+                self._last_send = self.clock()
+
+    def _run(self):
+        try:
+            with self._lock:
+                self._load_state()
+            while True:
+                try:
+                    error_message = self._queue.get(timeout=1)
+                except queue.Empty:
+                    error_message = ""
+                with self._lock:
+                    if error_message:
+                        self._handle(error_message)
+                    self._expire()
+                self._drain_outbox()
+                if error_message is None:
+                    return
+        finally:
+            self._save_state()
+            if self._emailer is not None:
+                self._emailer.close()
@@ -0,0 +1,144 @@
+import os
+import hashlib
+import typing as t
+from functools import wraps
+from pathlib import Path
+
+import backoff
+
+
+class StageError(Exception):
+    """
+    A pipeline stage gave up, after exhausting its retries (`retryable`) or on the
+    first non-retryable error.
+    """
+
+    def __init__(self, stage: str, error: Exception, retryable: bool):
+        super().__init__(f"{stage} stage failed: {error!r}")
+        self.stage = stage
+        self.error = error
+        self.retryable = retryable
+
+
+class Stage:
+    """
+    A single step of the update pipeline with its own retry policy.
+
+    Only exceptions matching `retry_on` are retried (with exponential backoff, up to
+    `max_tries` attempts in total); anything else fails the stage immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: t.Callable,
+        retry_on: t.Tuple[t.Type[Exception], ...] = (),
+        max_tries: int = 1,
+        wait_gen: t.Callable = backoff.expo,
+        **wait_gen_kwargs,
+    ):
+        self.name = name
+        self.function = function
+        self.retry_on = retry_on
+        self.max_tries = max_tries
+        self._attempt = backoff.on_exception(
+            wait_gen,
+            retry_on,
+            max_tries=lambda: self.max_tries,
+            **wait_gen_kwargs,
+        )(function)
+
+    def __call__(self, *args, **kwargs):
+        try:
+            return self._attempt(*args, **kwargs)
+        except Exception as error:
+            raise StageError(
+                self.name, error, isinstance(error, self.retry_on)
+            ) from error
+
+
+class CacheError(Exception):
+    """Local cache I/O failed; kept apart from stage errors so it is never retried."""
+
+
+def _cache_io(method: t.Callable) -> t.Callable:
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except OSError as error:
+            raise CacheError(f"cache at {self.root} is unusable: {error}") from error
+
+    return wrapper
+
+
+class ContentCache:
+    """
+    On-disk store of stage outputs, keyed by a hash of the content they derive from.
+
+    Only the `max_entries` most recently used entries of a namespace are kept; older
+    ones are pruned whenever a new entry is marked as the latest.
+    """
+
+    def __init__(self, root: t.Union[str, Path], max_entries: int = 5):
+        self.root = Path(root)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def digest(content: str) -> str:
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _path(self, namespace: str, key: str) -> Path:
+        return self.root / namespace / key
+
+    @_cache_io
+    def load(self, namespace: str, key: str) -> t.Union[str, None]:
+        path = self._path(namespace, key)
+        if not path.is_file():
+            return None
+        return path.read_text(encoding="utf-8")
+
+    @_cache_io
+    def store(self, namespace: str, key: str, content: str):
+        path = self._path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{key}.tmp")
+        temp_path.write_text(content, encoding="utf-8")
+        os.replace(temp_path, path)  # readers never see a partially written entry
+
+    @_cache_io
+    def mark_latest(self, namespace: str, key: str):
+        os.utime(self._path(namespace, key))  # reused entries count as recent
+        self.store(namespace, "latest", key)
+        self.prune(namespace)
+
+    @_cache_io
+    def prune(self, namespace: str):
+        latest = self.latest_key(namespace)
+        entries = sorted(
+            (
+                path
+                for path in (self.root / namespace).iterdir()
+                if path.is_file()
+                and path.name not in ("latest", latest)
+                and not path.name.startswith(".")
+            ),
+            key=lambda path: path.stat().st_mtime_ns,
+            reverse=True,
+        )
+        keep = self.max_entries - (latest is not None)
+        for path in entries[max(keep, 0) :]:
+            path.unlink(missing_ok=True)
+
+    def latest_key(self, namespace: str) -> t.Union[str, None]:
+        return self.load(namespace, "latest")
+
+    def store_latest(self, namespace: str, content: str) -> str:
+        key = self.digest(content)
+        self.store(namespace, key, content)
+        self.mark_latest(namespace, key)
+        return key
+
+    def load_latest(self, namespace: str) -> t.Union[str, None]:
+        key = self.latest_key(namespace)
+        return None if key is None else self.load(namespace, key)
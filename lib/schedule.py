@@ -10,6 +10,7 @@ import pytz
 
 class Run:
     _essential_attrs = ["summary", "description", "start", "end"]
+    _metadata_attrs = ["category", "platform", "runners", "host", "couch"]
 
     def __init__(
         self,
@@ -17,11 +18,22 @@ class Run:
         description: str,
         start: str,
         end: str,
+        category: str = None,
+        platform: str = None,
+        runners: list[str] = None,
+        host: str = None,
+        couch: list[str] = None,
     ):
         self.summary = summary
         self.description = description
         self.start = start
         self.end = end
+        # structured metadata, only known for runs parsed from the schedule page
+        self.category = category
+        self.platform = platform
+        self.runners = runners or []
+        self.host = host
+        self.couch = couch or []
 
     @staticmethod
     def _generate_datetime_strings(
@@ -102,8 +114,23 @@ class Run:
             *cls._generate_datetime_strings(
                 year, day, start_time, estimate, timezone_offset
             ),
+            category=run_category,
+            platform=platform,
+            runners=runners,
+            host=host,
+            couch=couch,
         )
 
+    def to_dict(self) -> dict:
+        return {
+            attr: getattr(self, attr)
+            for attr in self._essential_attrs + self._metadata_attrs
+        }
+
+    @classmethod
+    def from_dict(cls, run_dict: dict) -> "Run":
+        return cls(**run_dict)
+
     def __repr__(self):
         repr_string = ", ".join(
             [repr(getattr(self, attr)) for attr in self._essential_attrs]
@@ -130,7 +157,8 @@ class ScheduleParser:
         assert event_title
         return event_title[-4:]
 
-    def _get_timezone_offset(self) -> int:
+    @staticmethod
+    def get_timezone_offset() -> int:
         now = time.time()
         utc_reference = datetime.fromtimestamp(now, pytz.utc).replace(tzinfo=None)
         naive_dt = datetime.fromtimestamp(now)
@@ -243,7 +271,7 @@ class ScheduleParser:
 
     def parse(self) -> list[Run]:
         year = self._parse_year()
-        timezone_offset = self._get_timezone_offset()
+        timezone_offset = self.get_timezone_offset()
         all_schedule_divs = self._find_event_containers()
 
         day = None
@@ -0,0 +1,189 @@
+import json
+import hashlib
+import threading
+import typing as t
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from .index import RunIndex, to_utc_string
+from .pipeline import CacheError, ContentCache
+from .schedule import Run
+
+
+FILTER_PARAMS = {
+    "runner": "runners",
+    "couch": "couch",
+    "host": "host",
+    "platform": "platform",
+    "category": "category",
+}
+RESPONSE_CACHE_SIZE = 1024
+
+
+def _filters(params: dict) -> dict:
+    return {
+        FILTER_PARAMS[name]: params[name] for name in FILTER_PARAMS if name in params
+    }
+
+
+def _limit(params: dict) -> t.Union[int, None]:
+    if "limit" not in params:
+        return None
+    limit = int(params["limit"])
+    if limit < 0:
+        raise ValueError("limit must not be negative")
+    return limit
+
+
+def _now(params: dict) -> str:
+    return to_utc_string(params.get("at") or datetime.now(timezone.utc))
+
+
+def _runs_payload(runs: list[Run]) -> dict:
+    return {"count": len(runs), "runs": [run.to_dict() for run in runs]}
+
+
+def status_route(index: RunIndex, params: dict) -> dict:
+    return {"version": index.version, "runs": len(index)}
+
+
+def runs_route(index: RunIndex, params: dict) -> dict:
+    return _runs_payload(
+        index.query(
+            start=to_utc_string(params["start"]) if "start" in params else None,
+            end=to_utc_string(params["end"]) if "end" in params else None,
+            limit=_limit(params),
+            **_filters(params),
+        )
+    )
+
+
+def now_route(index: RunIndex, params: dict) -> dict:
+    now = _now(params)
+    return _runs_payload(index.query(start=now, end=now, **_filters(params)))
+
+
+def next_route(index: RunIndex, params: dict) -> dict:
+    return _runs_payload(
+        index.query(
+            after=_now(params),
+            limit=_limit(params) if "limit" in params else 10,
+            **_filters(params),
+        )
+    )
+
+
+# routes answering relative to the current time can't reuse cached responses
+# unless the caller pins the time with `at`
+ROUTES = {
+    "/status": (status_route, False),
+    "/runs": (runs_route, False),
+    "/runs/now": (now_route, True),
+    "/runs/next": (next_route, True),
+}
+
+
+class RunRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for local tools polling the API
+    disable_nagle_algorithm = True  # headers and body are written separately
+    server: "RunServer"
+
+    def _respond(self, status: HTTPStatus, body: bytes = b"", etag: str = None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: HTTPStatus, message: str):
+        self._respond(status, json.dumps({"error": message}).encode())
+
+    def _render(self, index: RunIndex, path: str, params: dict) -> t.Tuple[bytes, str]:
+        route = ROUTES[path][0]
+        body = json.dumps(route(index, params)).encode()
+        return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+    def do_GET(self):
+        index, responses = self.server.state  # one consistent snapshot per request
+        url = urlsplit(self.path)
+        if url.path not in ROUTES:
+            return self._error(HTTPStatus.NOT_FOUND, f"unknown path {url.path}")
+        params = dict(parse_qsl(url.query))
+
+        cacheable = not ROUTES[url.path][1] or "at" in params
+        cache_key = (url.path, tuple(sorted(params.items())))
+        response = responses.get(cache_key) if cacheable else None
+        if response is None:
+            try:
+                response = self._render(index, url.path, params)
+            except ValueError as error:
+                return self._error(HTTPStatus.BAD_REQUEST, str(error))
+            if cacheable:
+                if len(responses) >= RESPONSE_CACHE_SIZE:
+                    responses.clear()
+                responses[cache_key] = response
+
+        body, etag = response
+        if etag in self.headers.get("If-None-Match", ""):
+            return self._respond(HTTPStatus.NOT_MODIFIED, etag=etag)
+        self._respond(HTTPStatus.OK, body, etag)
+
+    def log_message(self, format, *args):
+        pass  # per-request logging to stderr dominates the cost of a lookup
+
+
+class RunServer(ThreadingHTTPServer):
+    """
+    Serves the latest parsed run set from `cache` over a local JSON API.
+
+    A background thread polls the cache for a newly parsed run set every
+    `refresh_interval` seconds and swaps in a freshly built index in one
+    assignment, so requests always see either the old or the new run set.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: t.Tuple[str, int],
+        cache: ContentCache,
+        refresh_interval: float = 30,
+    ):
+        super().__init__(address, RunRequestHandler)
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.state: t.Tuple[RunIndex, dict] = (RunIndex([]), {})
+        self._stopped = threading.Event()
+        self.refresh()
+
+    def refresh(self) -> bool:
+        version = self.cache.latest_key("runs")
+        if version is None or version == self.state[0].version:
+            return False
+        runs = [
+            Run.from_dict(run) for run in json.loads(self.cache.load("runs", version))
+        ]
+        self.state = (RunIndex(runs, version), {})
+        return True
+
+    def _watch(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except (CacheError, ValueError, TypeError):
+                pass  # keep serving the last good run set
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        watcher = threading.Thread(target=self._watch, name="run-index-watcher")
+        watcher.daemon = True
+        watcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._stopped.set()
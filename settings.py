@@ -1 +1,10 @@
-calendar_id = "<YOUR_CALENDAR_ID>@group.calendar.google.com"
\ No newline at end of file
+calendar_id = "<YOUR_CALENDAR_ID>@group.calendar.google.com"
+
+SMTP = {"server": "smtp.gmail.com", "port": 587}
+EMAIL_RECIPIENTS = ["<YOUR_EMAIL_ADDRESS>"]
+
+ALERTS = {
+    "coalesce_window": 15 * 60,  # seconds during which identical tracebacks are merged
+    "min_send_interval": 60,  # minimum seconds between two outgoing alert emails
+    "state_file": "logs/alert_state.json",  # merge state shared between runs
+}
@@ -0,0 +1,211 @@
+import json
+import logging
+import smtplib
+import threading
+
+import pytest
+
+from lib.notifications import SMTPConnection, Emailer, AlertDispatcher
+
+
+class LocalSMTP:
+    """Stand-in for `smtplib.SMTP` that records sessions and messages in memory."""
+
+    sessions = []
+    drop_next = False
+
+    def __init__(self, server, port, timeout=None):
+        self.messages = []
+        LocalSMTP.sessions.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, message):
+        if LocalSMTP.drop_next:
+            LocalSMTP.drop_next = False
+            raise smtplib.SMTPServerDisconnected("idle timeout")
+        self.messages.append(message)
+
+    def quit(self):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_emailer():
+    return Emailer(
+        SMTPConnection("localhost", 25, "calude@localhost", "", smtp_class=LocalSMTP)
+    )
+
+
+def sent_messages():
+    return [message for session in LocalSMTP.sessions for message in session.messages]
+
+
+def setup_function():
+    LocalSMTP.sessions = []
+    LocalSMTP.drop_next = False
+
+
+def test_connection_is_reused_and_reconnects():
+    emailer = make_emailer()
+    emailer.send_alert("first", ["ops@localhost"])
+    emailer.send_alert("second", ["ops@localhost"])
+    assert len(LocalSMTP.sessions) == 1
+
+    LocalSMTP.drop_next = True
+    emailer.send_alert("third", ["ops@localhost"])
+    assert len(LocalSMTP.sessions) == 2
+    assert [m.get_content().strip() for m in sent_messages()] == [
+        "first",
+        "second",
+        "third",
+    ]
+
+
+def make_dispatcher(
+    state_path, clock, emailer_factory=make_emailer, min_send_interval=10
+):
+    return AlertDispatcher(
+        emailer_factory,
+        ["ops@localhost"],
+        logging.getLogger("calude_alerts_test"),
+        state_path=state_path,
+        coalesce_window=60,
+        min_send_interval=min_send_interval,
+        clock=clock,
+    )
+
+
+def subjects():
+    return [message["Subject"] for message in sent_messages()]
+
+
+def test_repeated_tracebacks_are_coalesced(tmp_path):
+    state_path = tmp_path / "alerts.json"
+    clock = FakeClock()
+    dispatcher = make_dispatcher(state_path, clock)
+    for _ in range(5):
+        dispatcher.submit("Traceback: boom")
+    dispatcher.submit("Traceback: other")
+    dispatcher.close(timeout=5)
+
+    # the second alert is inside min_send_interval, so it waits for a later run
+    assert subjects() == ["Calendar Error"]
+    assert len(json.loads(state_path.read_text())["outbox"]) == 1
+
+    clock.now += 10
+    make_dispatcher(state_path, clock).close(timeout=5)
+    assert subjects() == ["Calendar Error", "Calendar Error"]
+    assert "Traceback: other" in sent_messages()[-1].get_content()
+
+
+def test_coalescing_carries_over_between_runs(tmp_path):
+    state_path = tmp_path / "alerts.json"
+    clock = FakeClock()
+
+    # every updater run is a separate process with its own dispatcher
+    for _ in range(3):
+        dispatcher = make_dispatcher(state_path, clock)
+        dispatcher.submit("Traceback: boom")
+        dispatcher.close(timeout=5)
+        clock.now += 15
+    assert [message["Subject"] for message in sent_messages()] == ["Calendar Error"]
+
+    clock.now += 60  # window has closed; the next run reports the repeats
+    make_dispatcher(state_path, clock).close(timeout=5)
+    messages = sent_messages()
+    assert [message["Subject"] for message in messages] == [
+        "Calendar Error",
+        "Calendar Error (repeated)",
+    ]
+    assert "2 more time(s)" in messages[-1].get_content()
+
+    make_dispatcher(state_path, clock).close(timeout=5)
+    assert len(sent_messages()) == 2
+
+
+def test_failed_sends_are_logged(tmp_path, caplog):
+    def missing_credentials():
+        raise ModuleNotFoundError("No module named '_auth'")
+
+    clock = FakeClock()
+    dispatcher = make_dispatcher(
+        tmp_path / "alerts.json", clock, missing_credentials, min_send_interval=0
+    )
+    dispatcher.submit("Traceback: boom")
+    dispatcher.submit("Traceback: other")
+    dispatcher.close(timeout=5)
+
+    failures = [r for r in caplog.records if r.message.startswith("Failed to send")]
+    assert [record.exc_info[0] for record in failures] == [ModuleNotFoundError] * 2
+    assert "Traceback: other" in failures[-1].message
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        "{not json",
+        '{"alerts": {}}',
+        '{"last_send": null, "alerts": []}',
+        '{"last_send": null, "alerts": {"key": {"error_message": "boom"}}}',
+    ],
+)
+def test_malformed_state_is_logged_and_reset(tmp_path, caplog, state):
+    state_path = tmp_path / "alerts.json"
+    state_path.write_text(state)
+
+    dispatcher = make_dispatcher(state_path, FakeClock())
+    dispatcher.submit("Traceback: boom")
+    dispatcher.close(timeout=5)
+
+    assert [message["Subject"] for message in sent_messages()] == ["Calendar Error"]
+    assert any(r.message.startswith("Ignoring unreadable") for r in caplog.records)
+    assert len(json.loads(state_path.read_text())["alerts"]) == 1
+
+
+def test_steady_failure_sends_one_email_per_window(tmp_path):
+    state_path = tmp_path / "alerts.json"
+    clock = FakeClock()
+
+    for _ in range(9):  # fails every run, across two window boundaries
+        dispatcher = make_dispatcher(state_path, clock)
+        dispatcher.submit("Traceback: boom")
+        dispatcher.close(timeout=5)
+        clock.now += 15
+
+    assert subjects() == [
+        "Calendar Error",
+        "Calendar Error (repeated)",
+        "Calendar Error (repeated)",
+    ]
+    assert all("4 more time(s)" in m.get_content() for m in sent_messages()[1:])
+
+
+def test_close_timeout_still_saves_state(tmp_path):
+    state_path = tmp_path / "alerts.json"
+    release = threading.Event()
+
+    def hanging_emailer():
+        release.wait(5)
+        return make_emailer()
+
+    dispatcher = make_dispatcher(state_path, FakeClock(), hanging_emailer)
+    dispatcher.submit("Traceback: boom")
+    dispatcher.close(timeout=0.2)
+
+    state = json.loads(state_path.read_text())
+    assert len(state["alerts"]) == 1
+    assert [email["subject"] for email in state["outbox"]] == ["Calendar Error"]
+    release.set()
+    dispatcher._worker.join(5)  # don't let the late send leak into other tests
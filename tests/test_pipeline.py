@@ -0,0 +1,232 @@
+import os
+
+import backoff
+import pytest
+
+import calude
+from lib.interfaces import GCalInterface
+from lib.pipeline import Stage, StageError, CacheError, ContentCache
+from lib.schedule import Run, ScheduleParser
+
+
+def flaky(failures: list):
+    calls = []
+
+    def function(value):
+        calls.append(value)
+        if failures:
+            raise failures.pop(0)
+        return value
+
+    return function, calls
+
+
+def test_stage_retries_retryable_errors():
+    function, calls = flaky([ConnectionError(), ConnectionError()])
+    stage = Stage(
+        "fetch",
+        function,
+        retry_on=(ConnectionError,),
+        max_tries=3,
+        wait_gen=backoff.constant,
+        interval=0,
+    )
+    assert stage("html") == "html"
+    assert len(calls) == 3
+
+
+def test_stage_fails_fast_on_non_retryable_errors():
+    function, calls = flaky([AttributeError("DOM changed")])
+    stage = Stage("parse", function, retry_on=(ConnectionError,), max_tries=5)
+    with pytest.raises(StageError) as error:
+        stage("html")
+    assert len(calls) == 1
+    assert error.value.stage == "parse"
+    assert not error.value.retryable
+
+
+def test_stage_gives_up_after_max_tries():
+    function, calls = flaky([ConnectionError()] * 5)
+    stage = Stage(
+        "fetch",
+        function,
+        retry_on=(ConnectionError,),
+        max_tries=2,
+        wait_gen=backoff.constant,
+        interval=0,
+    )
+    with pytest.raises(StageError) as error:
+        stage("html")
+    assert len(calls) == 2
+    assert error.value.retryable
+
+
+def test_content_cache_round_trip(tmp_path):
+    cache = ContentCache(tmp_path)
+    assert cache.load_latest("html") is None
+
+    key = cache.store_latest("html", "<html></html>")
+    assert key == cache.digest("<html></html>")
+    assert cache.load("html", key) == "<html></html>"
+    assert cache.load_latest("html") == "<html></html>"
+
+
+def test_content_cache_prunes_old_entries(tmp_path):
+    cache = ContentCache(tmp_path, max_entries=2)
+    keys = [cache.store_latest("html", f"<html>{number}</html>") for number in range(5)]
+    remaining = {path.name for path in (tmp_path / "html").iterdir()}
+    assert len(remaining - {"latest"}) == 2
+    assert keys[-1] in remaining
+
+
+def test_content_cache_prune_keeps_latest_and_newest(tmp_path):
+    cache = ContentCache(tmp_path, max_entries=3)
+    for age, key in enumerate(["newest", "newer", "old", "oldest"]):
+        cache.store("runs", key, key)
+        os.utime(tmp_path / "runs" / key, (1000 - age, 1000 - age))
+    cache.store("runs", "latest", "oldest")
+
+    cache.prune("runs")
+    assert sorted(path.name for path in (tmp_path / "runs").iterdir()) == [
+        "latest",
+        "newer",
+        "newest",
+        "oldest",
+    ]
+
+
+class CountingParser(ScheduleParser):
+    parses = 0
+    offset = -5
+
+    def __init__(self, schedule_html: str):
+        self.schedule_html = schedule_html
+
+    @staticmethod
+    def get_timezone_offset() -> int:
+        return CountingParser.offset
+
+    def parse(self) -> list[Run]:
+        CountingParser.parses += 1
+        return [
+            Run(
+                "Celeste",
+                self.schedule_html,
+                "2024-01-07T16:30:00Z",
+                "2024-01-07T17:00:00Z",
+                runners=["Alice"],
+            )
+        ]
+
+
+@pytest.fixture
+def parse_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(calude, "cache", ContentCache(tmp_path))
+    monkeypatch.setattr(calude, "ScheduleParser", CountingParser)
+    CountingParser.parses = 0
+    CountingParser.offset = -5
+
+
+def test_parse_reuses_cached_runs(parse_cache):
+    first = calude.parse_schedule_html("<html>schedule</html>")
+    second = calude.parse_schedule_html("<html>schedule</html>")
+    assert CountingParser.parses == 1
+    assert second == first
+    assert second[0].runners == ["Alice"]
+
+    calude.parse_schedule_html("<html>changed</html>")
+    assert CountingParser.parses == 2
+
+
+@pytest.fixture
+def broken_cache(tmp_path, monkeypatch):
+    not_a_directory = tmp_path / "cache"
+    not_a_directory.write_text("")
+    monkeypatch.setattr(calude, "cache", ContentCache(not_a_directory))
+
+
+class FakeSite:
+    fetches = 0
+
+    def __init__(self, url: str):
+        self.driver = self
+
+    def get_html(self) -> str:
+        FakeSite.fetches += 1
+        return "<html>schedule</html>"
+
+    def quit(self):
+        pass
+
+
+def test_cache_failure_is_not_a_parse_failure(parse_cache, broken_cache):
+    with pytest.raises(CacheError):
+        calude.parse_schedule_html("<html>schedule</html>")
+    assert CountingParser.parses == 1
+
+
+def test_cache_failure_does_not_refetch(parse_cache, broken_cache, monkeypatch):
+    monkeypatch.setattr(calude, "HTMLInterface", FakeSite)
+    monkeypatch.setattr(calude.fetch_stage, "max_tries", 5)
+    FakeSite.fetches = 0
+
+    with pytest.raises(CacheError):
+        calude.parse_schedule_and_init_gcal(calendar_id=None, use_cached_html=False)
+    assert FakeSite.fetches == 1
+    assert CountingParser.parses == 0
+
+
+def test_parse_cache_is_keyed_on_timezone_offset(parse_cache):
+    calude.parse_schedule_html("<html>schedule</html>")
+    CountingParser.offset = -4  # DST started since the page was last parsed
+    calude.parse_schedule_html("<html>schedule</html>")
+    assert CountingParser.parses == 2
+
+
+class LocalCalendar(GCalInterface):
+    def __init__(self, events: list[dict]):
+        super().__init__("local@group.calendar.google.com")
+        self.cached_events = events
+
+    def _authenticate(self):
+        return None
+
+
+def make_run(summary: str, start: str) -> Run:
+    return Run(summary, "", f"2024-01-07T{start}:00Z", f"2024-01-07T{start}:30Z")
+
+
+def test_diff_calendar_finds_outdated_and_new_events():
+    kept, moved, dropped = (
+        make_run("Celeste", "10:00"),
+        make_run("Portal", "11:00"),
+        make_run("Tetris", "12:00"),
+    )
+    calendar = LocalCalendar(
+        [{**run.to_gcal_event(), "id": run.summary} for run in (kept, moved, dropped)]
+    )
+    rescheduled = make_run("Portal", "11:15")
+    new = make_run("Metroid", "13:00")
+
+    outdated, to_add = calude.diff_calendar(
+        calendar, [kept, rescheduled, new], clear_calendar=False
+    )
+    assert [event["id"] for event in outdated] == ["Portal", "Tetris"]
+    assert to_add == [rescheduled.to_gcal_event(), new.to_gcal_event()]
+
+
+def test_diff_calendar_clear_replaces_everything():
+    kept = make_run("Celeste", "10:00")
+    calendar = LocalCalendar([{**kept.to_gcal_event(), "id": "Celeste"}])
+
+    outdated, to_add = calude.diff_calendar(calendar, [kept], clear_calendar=True)
+    assert [event["id"] for event in outdated] == ["Celeste"]
+    assert to_add == [kept.to_gcal_event()]
+
+
+def test_describe_stage_error_points_parse_failures_at_cached_html():
+    parse_error = StageError("parse", AttributeError("DOM changed"), retryable=False)
+    assert "-C" in calude.describe_stage_error(parse_error)
+
+    fetch_error = StageError("fetch", ConnectionError(), retryable=True)
+    assert "gave up" in calude.describe_stage_error(fetch_error)
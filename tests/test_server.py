@@ -0,0 +1,121 @@
+import json
+import threading
+import http.client
+
+import pytest
+
+from lib.index import RunIndex, to_utc_string
+from lib.pipeline import ContentCache
+from lib.schedule import Run
+from lib.server import RunServer
+
+
+def make_run(game, start, end, runners, **metadata):
+    return Run(
+        game,
+        "",
+        f"2024-01-07T{start}:00Z",
+        f"2024-01-07T{end}:00Z",
+        runners=runners,
+        **metadata,
+    )
+
+
+RUNS = [
+    make_run("Celeste", "10:00", "11:00", ["Alice"], platform="PC", host="Hank"),
+    make_run("Portal", "11:00", "11:30", ["Bob"], platform="PC", category="Any%"),
+    make_run("Metroid", "11:30", "13:00", ["Alice", "Bob"], platform="SNES"),
+    make_run("Tetris", "13:00", "13:20", ["Carol"], category="Any%"),
+]
+
+
+def publish(cache: ContentCache, runs: list[Run]) -> str:
+    key = cache.digest(json.dumps([run.to_dict() for run in runs]))
+    cache.store("runs", key, json.dumps([run.to_dict() for run in runs]))
+    cache.mark_latest("runs", key)
+    return key
+
+
+def summaries(runs):
+    return [run.summary for run in runs]
+
+
+def test_interval_queries():
+    index = RunIndex(reversed(RUNS))
+    assert summaries(
+        index.query(start="2024-01-07T11:00:00Z", end="2024-01-07T11:00:00Z")
+    ) == ["Portal"]
+    assert summaries(
+        index.query(start="2024-01-07T10:30:00Z", end="2024-01-07T11:45:00Z")
+    ) == ["Celeste", "Portal", "Metroid"]
+    assert summaries(index.query(after="2024-01-07T11:15:00Z", limit=1)) == ["Metroid"]
+
+
+def test_inverted_indexes_intersect():
+    index = RunIndex(RUNS)
+    assert summaries(index.query(runners="alice")) == ["Celeste", "Metroid"]
+    assert summaries(index.query(runners="bob", platform="pc")) == ["Portal"]
+    assert summaries(index.query(category="Any%", after="2024-01-07T12:00:00Z")) == [
+        "Tetris"
+    ]
+    assert index.query(host="nobody") == []
+
+
+def test_to_utc_string():
+    assert to_utc_string("2024-01-07T05:00:00-05:00") == "2024-01-07T10:00:00Z"
+    assert to_utc_string("2024-01-07T10:00:00") == "2024-01-07T10:00:00Z"
+
+
+@pytest.fixture
+def server(tmp_path):
+    cache = ContentCache(tmp_path)
+    publish(cache, RUNS)
+    server = RunServer(("127.0.0.1", 0), cache, refresh_interval=3600)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, json.loads(body) if body else None
+
+
+def test_runs_endpoint_with_etag(server):
+    response, payload = get(server, "/runs?runner=Alice")
+    assert response.status == 200
+    assert summaries(map(Run.from_dict, payload["runs"])) == ["Celeste", "Metroid"]
+
+    etag = response.getheader("ETag")
+    response, payload = get(server, "/runs?runner=Alice", {"If-None-Match": etag})
+    assert response.status == 304
+    assert payload is None
+
+
+def test_now_and_next_endpoints(server):
+    _, payload = get(server, "/runs/now?at=2024-01-07T12:00:00Z")
+    assert [run["summary"] for run in payload["runs"]] == ["Metroid"]
+
+    _, payload = get(server, "/runs/next?runner=bob&at=2024-01-07T10:30:00Z")
+    assert [run["summary"] for run in payload["runs"]] == ["Portal", "Metroid"]
+
+    response, _ = get(server, "/runs/next?limit=many")
+    assert response.status == 400
+
+
+def test_refresh_swaps_in_new_parse(server):
+    old_version = server.state[0].version
+    assert not server.refresh()
+
+    new_version = publish(server.cache, RUNS[:1])
+    assert server.refresh()
+    assert server.state[0].version == new_version != old_version
+
+    _, payload = get(server, "/status")
+    assert payload == {"version": new_version, "runs": 1}